@@ -1,13 +1,282 @@
-import requests
-from bs4 import BeautifulSoup
+import httpx
+from hishel import AsyncSqliteStorage, BaseFilter, FilterPolicy
+from hishel.httpx import AsyncCacheTransport
+from aiolimiter import AsyncLimiter
+import asyncio
+import collections
+import contextlib
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+from bs4 import BeautifulSoup, SoupStrainer
+from lxml import etree, html as lhtml
+import soupsieve
 import csv
-import re
-import time
+import functools
+import itertools
+import json
+import operator
+import os
+import sqlite3
+import threading
 
-def scrape_gsea(
+# Transient statuses worth retrying (as are connection errors and timeouts),
+# with exponential backoff between attempts
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+
+# At most max_concurrency * WRITE_AHEAD gene sets are in progress (or finished but
+# not yet written) ahead of the output writer
+WRITE_AHEAD = 4
+
+# Responses are kept in a local SQLite cache for up to a week (or the server's
+# max-age, if shorter), so re-runs hit the disk
+CACHE_EXPIRE_AFTER = 7 * 24 * 60 * 60
+
+# Only the gene-set table of the browse page is ever used; skip building the rest
+_BROWSE_STRAINER = SoupStrainer("table", id="geneSetTable")
+_DETAIL_LINK_SEL = soupsieve.compile("td a[href]")
+
+# Detail-page lookups, compiled once and evaluated entirely inside libxml2
+# (the table lookup is the XPath form of the CSS selector "table.lists4.human")
+_DETAIL_TABLE_XP = etree.XPath(
+    '//table[contains(concat(" ", normalize-space(@class), " "), " lists4 ")'
+    ' and contains(concat(" ", normalize-space(@class), " "), " human ")]'
+)
+_DETAIL_CELLS_XP = etree.XPath(".//tr/th | .//tr/td")
+_PUBMED_LINK_XP = etree.XPath('.//a[contains(@href,"pubmed")]')
+_TSV_HREF_XP = etree.XPath('//a[contains(@href,"download_geneset.jsp") and contains(@href,"fileType=TSV")]/@href')
+
+# MSigDB serves UTF-8; declaring it up front skips encoding detection entirely.
+# lxml parser objects must not be shared between threads, so keep one per thread.
+_parser_local = threading.local()
+
+def _utf8_html_parser():
+    parser = getattr(_parser_local, "parser", None)
+    if parser is None:
+        parser = _parser_local.parser = lhtml.HTMLParser(encoding="utf-8")
+    return parser
+
+def _label_value_cells(table):
+    """Return the (th, td) pair of every labelled row in 'table'.
+
+    One XPath fetches all cells; on the usual th/td-per-row table they simply
+    alternate and are zipped into pairs. Any irregular layout falls back to
+    walking the rows one by one.
+    """
+    cells = _DETAIL_CELLS_XP(table)
+    it = iter(cells)
+    pairs = list(zip(it, it))
+    if len(cells) % 2 or any(
+        th.tag != "th" or td.tag != "td" or th.getparent() is not td.getparent()
+        for th, td in pairs
+    ):
+        pairs = [(tr.find("th"), tr.find("td")) for tr in table.iter("tr")]
+        pairs = [(th, td) for th, td in pairs if th is not None and td is not None]
+    return pairs
+
+def _text(el, sep=""):
+    """Same as BeautifulSoup's get_text(sep, strip=True), for an lxml element."""
+    return sep.join(s for s in (t.strip() for t in el.itertext()) if s)
+
+def _cache_control(headers):
+    """Parse a Cache-Control header into {directive: value or None}."""
+    directives = {}
+    for part in (headers.get("cache-control") or "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+def _max_age(headers):
+    """The response's Cache-Control max-age in seconds, or None if absent/invalid."""
+    try:
+        return int(_cache_control(headers)["max-age"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+class _CacheableResponsesOnly(BaseFilter):
+    """Cache filter: only store 200 responses the server allows us to keep.
+
+    Errors and 304s are never stored, nor are responses marked no-store or
+    no-cache (this cache never revalidates), or with max-age=0. "private" is
+    no obstacle: this single-user, on-disk cache is a private cache.
+    """
+
+    def needs_body(self):
+        return False
+
+    def apply(self, item, body):
+        if item.status_code != 200:
+            return False
+        directives = _cache_control(item.headers)
+        if {"no-store", "no-cache"} & directives.keys():
+            return False
+        return _max_age(item.headers) != 0
+
+class _MaxAgeSqliteStorage(AsyncSqliteStorage):
+    """SQLite cache storage that expires each entry after the response's own
+    max-age, when it sends one, capped at the default TTL."""
+
+    async def create_entry(self, request, response, key, id_=None):
+        max_age = _max_age(response.headers)
+        if max_age is not None:
+            ttl = min(max_age, self.default_ttl) if self.default_ttl is not None else max_age
+            request = dataclasses.replace(request, metadata={**request.metadata, "hishel_ttl": ttl})
+        return await super().create_entry(request, response, key, id_)
+
+class _RateLimitedTransport(httpx.AsyncBaseTransport):
+    """Wraps the network transport so only requests that really go out are
+    rate-limited; it sits under the cache, so cache hits are never throttled."""
+
+    def __init__(self, transport, limiter):
+        self._transport = transport
+        self._limiter = limiter
+
+    async def handle_async_request(self, request):
+        async with self._limiter:
+            return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+async def _byte_lines(chunks, head=b""):
+    """Yield the b"\n"-separated lines of 'head' followed by an async stream of byte chunks."""
+    *lines, pending = head.split(b"\n")
+    for line in lines:
+        yield line
+    async for chunk in chunks:
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+def _kv_field(data, key):
+    """Value of the "key<TAB>value" line in a key-value TSV body that starts with b"\n"."""
+    i = data.find(b"\n" + key + b"\t")
+    if i < 0:
+        return ""
+    i += len(key) + 2
+    j = data.find(b"\n", i)
+    return data[i:j if j >= 0 else None].strip().decode("utf-8")
+
+# --------------------------------------------------------
+# Output columns, and the record holding one gene set's row
+# --------------------------------------------------------
+FIELDNAMES = (
+    "STANDARD_NAME",
+    "SYSTEMATIC_NAME",
+    "COLLECTION",
+    "MSIGDB_URL",
+    "NAMESPACE",
+    "DESCRIPTION_BRIEF",
+    "DESCRIPTION_FULL",
+    "PMID",
+    "GEOID",
+    "AUTHORS",
+    "CONTRIBUTOR",
+    "CONTRIBUTOR_ORG",
+    "EXACT_SOURCE",
+    "FILTERED_BY_SIMILARITY",
+    "EXTERNAL_NAMES_FOR_SIMILAR_TERMS",
+    "EXTERNAL_DETAILS_URL",
+    "SOURCE_MEMBERS",
+    "GENE_SYMBOLS",
+    "FOUNDER_NAMES",
+)
+
+# Fetches every column of a GeneSetMeta, in FIELDNAMES order, as one tuple
+_ROW_VALUES = operator.attrgetter(*FIELDNAMES)
+
+class GeneSetMeta:
+    """Metadata for one gene set, one attribute per output column (all default to "")."""
+    __slots__ = FIELDNAMES
+
+    def __init__(self):
+        for field in self.__slots__:
+            setattr(self, field, "")
+
+    @classmethod
+    def from_row(cls, row):
+        # Rows stored under an older column set may carry keys that are no longer
+        # columns; skip them (missing columns keep their "" default)
+        meta = cls()
+        for field in cls.__slots__:
+            if field in row:
+                setattr(meta, field, row[field])
+        return meta
+
+    def as_row(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def as_tuple(self):
+        return _ROW_VALUES(self)
+
+# --------------------------------------------------------
+# Detail-page label handlers: (value, td, meta) -> None
+# --------------------------------------------------------
+def _set(field):
+    return lambda value, td, meta: setattr(meta, field, value)
+
+def _collection(value, td, meta):
+    meta.COLLECTION = value.replace("\n", " ")
+
+def _source_publication(value, td, meta):
+    # Could contain Pubmed link or authors
+    pmid_links = _PUBMED_LINK_XP(td)
+    if pmid_links:
+        meta.PMID = pmid_links[0].text_content().strip().replace("Pubmed","").strip()
+    # Check if "Authors:" is in the text
+    authors_idx = value.lower().find("authors:")
+    if authors_idx != -1:
+        meta.AUTHORS = value[authors_idx + len("authors:"):].strip()
+
+def _contributed_by(value, td, meta):
+    # Typically "Name (Org)"
+    # e.g. "Dharmesh D. Bhuva (Walter and Eliza Hall Institute of Medical Research)"
+    if value.endswith(")") and "(" in value:
+        name, org = value[:-1].rsplit("(", 1)
+        meta.CONTRIBUTOR = name.strip()
+        meta.CONTRIBUTOR_ORG = org.strip()
+    else:
+        # fallback if no parentheses
+        meta.CONTRIBUTOR = value
+
+# Keyed by the lowercased <th> label. Additional fields can be mapped as needed.
+LABEL_DISPATCH = {
+    "standard name": _set("STANDARD_NAME"),
+    "systematic name": _set("SYSTEMATIC_NAME"),
+    "collection": _collection,
+    "identifier namespace": _set("NAMESPACE"),
+    "source platform": _set("NAMESPACE"),
+    "brief description": _set("DESCRIPTION_BRIEF"),
+    "full description": _set("DESCRIPTION_FULL"),
+    "source publication": _source_publication,
+    "exact source": _set("EXACT_SOURCE"),
+    "filtered by similarity": _set("FILTERED_BY_SIMILARITY"),
+    "external links": _set("EXTERNAL_DETAILS_URL"),
+    "contributed by": _contributed_by,
+    "founder": _set("FOUNDER_NAMES"),
+}
+
+@functools.lru_cache(maxsize=None)
+def _label_handler(label):
+    """Look up the handler for a label; labels that merely contain a known key
+    (e.g. "founder names") fall back to a scan, memoized per distinct label."""
+    handler = LABEL_DISPATCH.get(label)
+    if handler is None:
+        handler = next((fn for key, fn in LABEL_DISPATCH.items() if key in label), None)
+    return handler
+
+async def scrape_gsea(
     browse_url="https://www.gsea-msigdb.org/gsea/msigdb/human/genesets.jsp?letter=A",
     output_tsv="gsea_results.tsv",
-    sleep_seconds=0.5
+    requests_per_second=4,
+    max_concurrency=10,
+    parse_workers=4,
+    cache_path="gsea_cache.sqlite",
+    etag_path="gsea_etags.sqlite"
 ):
     """
     A script to:
@@ -18,215 +287,264 @@ def scrape_gsea(
          - Row-based TSVs (header includes "GENE_SYMBOL\tGENE_ID"), typically for microRNA sets
          - Key-value TSVs (one line per field, e.g. "GENE_SYMBOLS\tTSPAN1,MPZL2,..."), often for curated sets
       5) Write all results (metadata + gene symbols) to a single TSV file.
+
+    Detail pages and TSVs are fetched concurrently over one HTTP/2 httpx client;
+    at most 'max_concurrency' requests are in flight, and a global limiter
+    caps network requests at 'requests_per_second' to stay polite (cache hits
+    are not limited). Detail-page parsing runs on a pool of 'parse_workers'
+    threads so it does not stall the downloads.
+    Responses are cached in 'cache_path', as far as their Cache-Control
+    allows, so repeated runs only re-download expired pages. Detail-page ETags
+    and the metadata scraped for them are stored per page in the SQLite file
+    'etag_path'; pages the server reports as unchanged (304) are not parsed
+    again and their TSV is not re-downloaded.
     """
 
-    # --------------------------------------------------------
-    # 1. Fetch the "browse" (or "search") page that lists gene sets
-    # --------------------------------------------------------
-    print(f"Fetching browse page: {browse_url}")
-    browse_resp = requests.get(browse_url)
-    browse_resp.raise_for_status()
-    soup = BeautifulSoup(browse_resp.text, "html.parser")
-
-    # The table that contains gene-set links is typically:
-    # <table id="geneSetTable" class="lists2 human"> ...
-    table = soup.find("table", id="geneSetTable")
-    if not table:
-        print("Could not find a table with id='geneSetTable'. Aborting.")
-        return
-
-    # Collect all <a> links within the table
-    detail_links = []
-    for td in table.find_all("td"):
-        for link_tag in td.find_all("a", href=True):
-            relative_url = link_tag["href"]  # e.g. "msigdb/human/geneset/XXX.html"
-            # Make a full URL
-            full_url = "https://www.gsea-msigdb.org/gsea/" + relative_url
-            detail_links.append(full_url)
-
-    print(f"Found {len(detail_links)} gene-set links on the page.")
-
-    # --------------------------------------------------------
-    # 2. Prepare result storage and define output columns
-    # --------------------------------------------------------
-    results = []
-    fieldnames = [
-        "STANDARD_NAME",
-        "SYSTEMATIC_NAME",
-        "COLLECTION",
-        "MSIGDB_URL",
-        "NAMESPACE",
-        "DESCRIPTION_BRIEF",
-        "DESCRIPTION_FULL",
-        "PMID",
-        "GEOID",
-        "AUTHORS",
-        "CONTRIBUTOR",
-        "CONTRIBUTOR_ORG",
-        "EXACT_SOURCE",
-        "FILTERED_BY_SIMILARITY",
-        "EXTERNAL_NAMES_FOR_SIMILAR_TERMS",
-        "EXTERNAL_DETAILS_URL",
-        "SOURCE_MEMBERS",
-        "GENE_SYMBOLS",
-        "FOUNDER_NAMES"
-    ]
-
-    # --------------------------------------------------------
-    # 3. Visit each gene-set detail page and gather metadata
-    # --------------------------------------------------------
-    for i, detail_url in enumerate(detail_links, start=1):
-        print(f"[{i}/{len(detail_links)}] Fetching detail page: {detail_url}")
-        resp = requests.get(detail_url)
-        resp.raise_for_status()
-        detail_soup = BeautifulSoup(resp.text, "html.parser")
-
-        # Initialize our metadata dict
-        meta = {fn: "" for fn in fieldnames}
-        meta["MSIGDB_URL"] = detail_url  # always store the detail page link
-
-        # The detail page typically has a table with class="lists4 human"
-        detail_table = detail_soup.find("table", class_="lists4 human")
-        if detail_table:
-            # Each row has <th> for the label and <td> for the value
-            rows = detail_table.find_all("tr")
-            for tr in rows:
-                th = tr.find("th")
-                td = tr.find("td")
-                if not th or not td:
-                    continue
-
-                label = th.get_text(strip=True).lower()
-                value = td.get_text(" ", strip=True)  # join <br> with spaces
-
-                # Simple matching for known labels
-                if "standard name" in label:
-                    meta["STANDARD_NAME"] = value
-                elif "systematic name" in label:
-                    meta["SYSTEMATIC_NAME"] = value
-                elif "collection" in label:
-                    meta["COLLECTION"] = value.replace("\n", " ")
-                elif "identifier namespace" in label or "source platform" in label:
-                    meta["NAMESPACE"] = value
-                elif "brief description" in label:
-                    meta["DESCRIPTION_BRIEF"] = value
-                elif "full description" in label:
-                    meta["DESCRIPTION_FULL"] = value
-                elif "source publication" in label:
-                    # Could contain Pubmed link or authors
-                    pmid_link = td.find("a", href=re.compile("pubmed"))
-                    if pmid_link:
-                        meta["PMID"] = pmid_link.text.strip().replace("Pubmed","").strip()
-                    # Check if "Authors:" is in the text
-                    authors_idx = value.lower().find("authors:")
-                    if authors_idx != -1:
-                        meta["AUTHORS"] = value[authors_idx + len("authors:"):].strip()
-                elif "exact source" in label:
-                    meta["EXACT_SOURCE"] = value
-                elif "filtered by similarity" in label:
-                    meta["FILTERED_BY_SIMILARITY"] = value
-                elif "external links" in label:
-                    meta["EXTERNAL_DETAILS_URL"] = value
-                elif "contributed by" in label:
-                    # Typically "Name (Org)"
-                    # e.g. "Dharmesh D. Bhuva (Walter and Eliza Hall Institute of Medical Research)"
-                    match_paren = re.search(r"(.*)\((.*)\)", value)
-                    if match_paren:
-                        meta["CONTRIBUTOR"] = match_paren.group(1).strip()
-                        meta["CONTRIBUTOR_ORG"] = match_paren.group(2).strip()
+    headers = {
+        "User-Agent": "Mozilla/5.0 (compatible; gsea-scraper)",
+        "Accept-Encoding": "gzip, deflate",
+    }
+    sem = asyncio.Semaphore(max_concurrency)
+
+    # HTTP/2 multiplexes every request to gsea-msigdb.org as a stream over one
+    # pooled TLS connection instead of one in-flight request per socket
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+    # (an absolute path, else hishel relocates the file under ./.cache/hishel/)
+    storage = _MaxAgeSqliteStorage(database_path=os.path.abspath(cache_path), default_ttl=CACHE_EXPIRE_AFTER)
+
+    # Transport stack: cache -> rate limiter -> HTTP/2 network
+    network = _RateLimitedTransport(
+        httpx.AsyncHTTPTransport(http2=True, limits=limits),
+        AsyncLimiter(requests_per_second, 1),
+    )
+    transport = AsyncCacheTransport(
+        next_transport=network,
+        storage=storage,
+        policy=FilterPolicy(response_filters=[_CacheableResponsesOnly()]),
+    )
+
+    async with httpx.AsyncClient(
+        transport=transport,
+        timeout=30,
+        headers=headers,
+        follow_redirects=True,
+    ) as client:
+
+        @contextlib.asynccontextmanager
+        async def get(url, headers=None):
+            """Stream a GET of 'url', retrying transient statuses and connection errors."""
+            for attempt in range(MAX_RETRIES + 1):
+                try:
+                    r = await client.send(client.build_request("GET", url, headers=headers), stream=True)
+                except httpx.TransportError:
+                    # Connect / read failures and timeouts are as transient as a 503
+                    if attempt == MAX_RETRIES:
+                        raise
+                else:
+                    if r.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                        break
+                    await r.aclose()
+                # Back off before retrying a throttled / failing request
+                await asyncio.sleep(BACKOFF_FACTOR * 2 ** attempt)
+            try:
+                if r.is_error:
+                    r.raise_for_status()
+                yield r
+            finally:
+                await r.aclose()
+
+        async def fetch(url, headers=None):
+            """Return (body, response headers); body is None on 304 Not Modified."""
+            async with sem:
+                async with get(url, headers) as r:
+                    body = None if r.status_code == 304 else await r.aread()
+                return body, r.headers
+
+        # --------------------------------------------------------
+        # 1. Fetch the "browse" (or "search") page that lists gene sets
+        # --------------------------------------------------------
+        print(f"Fetching browse page: {browse_url}")
+        browse_html, _ = await fetch(browse_url)
+        # Raw bytes go straight to the C-backed lxml parser, decoded as UTF-8
+        soup = BeautifulSoup(browse_html, "lxml", parse_only=_BROWSE_STRAINER, from_encoding="utf-8")
+
+        # The table that contains gene-set links is typically:
+        # <table id="geneSetTable" class="lists2 human"> ...
+        table = soup.find("table", id="geneSetTable")
+        if not table:
+            print("Could not find a table with id='geneSetTable'. Aborting.")
+            return
+
+        # Collect all <a> links within the table's cells, e.g. "msigdb/human/geneset/XXX.html",
+        # as full URLs. A set can be linked more than once; dict.fromkeys drops the
+        # repeats (keeping first-seen order) so each detail page is fetched only once.
+        detail_links = list(dict.fromkeys(
+            "https://www.gsea-msigdb.org/gsea/" + link_tag["href"]
+            for link_tag in _DETAIL_LINK_SEL.select(table)
+        ))
+
+        print(f"Found {len(detail_links)} gene-set links on the page.")
+
+        # --------------------------------------------------------
+        # 2. Visit each gene-set detail page and gather metadata
+        # --------------------------------------------------------
+        def parse_detail(detail_html, detail_url):
+            """Return (meta, TSV hrefs) for one detail page. Runs on the parse pool."""
+            try:
+                doc = lhtml.fromstring(detail_html, parser=_utf8_html_parser())
+            except etree.ParserError:
+                # An empty (or whitespace-only) page has no document at all;
+                # treat it like a page without the table
+                doc = None
+
+            # Initialize our metadata record
+            meta = GeneSetMeta()
+            meta.MSIGDB_URL = detail_url  # always store the detail page link
+
+            # The detail page typically has a table with class="lists4 human"
+            detail_tables = _DETAIL_TABLE_XP(doc) if doc is not None else []
+            if detail_tables:
+                # Each row has <th> for the label and <td> for the value
+                for th, td in _label_value_cells(detail_tables[0]):
+                    label = _text(th).lower()
+                    value = _text(td, " ")  # join <br> with spaces
+
+                    handler = _label_handler(label)
+                    if handler:
+                        handler(value, td, meta)
+            else:
+                print("  WARNING: No table with class='lists4 human' found on detail page. Skipping metadata extraction.")
+
+            return meta, _TSV_HREF_XP(doc) if doc is not None else []
+
+        async def process(i, detail_url):
+            print(f"[{i}/{len(detail_links)}] Fetching detail page: {detail_url}")
+            known_etag = etags.get(detail_url)
+            request_headers = {"If-None-Match": known_etag} if known_etag else None
+            detail_html, response_headers = await fetch(detail_url, request_headers)
+            if detail_html is None:
+                print("  Not modified since last run. Reusing stored metadata.")
+                (stored,) = etag_db.execute("SELECT meta FROM etags WHERE url = ?", (detail_url,)).fetchone()
+                return GeneSetMeta.from_row(json.loads(stored))
+
+            # lxml releases the GIL while parsing, so pages parse in parallel on
+            # the pool while the event loop keeps other downloads moving
+            meta, tsv_hrefs = await loop.run_in_executor(executor, parse_detail, detail_html, detail_url)
+            await fetch_genes(meta, tsv_hrefs)
+
+            etag = response_headers.get("ETag")
+            if etag:
+                # Stored right away, so the row itself is not kept alive for later
+                with etag_db:
+                    etag_db.execute(
+                        "INSERT OR REPLACE INTO etags (url, etag, meta) VALUES (?, ?, ?)",
+                        (detail_url, etag, json.dumps(meta.as_row())),
+                    )
+                etags[detail_url] = etag
+            return meta
+
+        # --------------------------------------------------------
+        # 3. Download the TSV that contains gene info
+        # --------------------------------------------------------
+        async def fetch_genes(meta, tsv_hrefs):
+            if not tsv_hrefs:
+                print("  WARNING: No TSV link found. Cannot collect gene members.")
+                return
+
+            tsv_url = "https://www.gsea-msigdb.org/gsea/" + tsv_hrefs[0]
+            print(f"  Downloading TSV: {tsv_url}")
+
+            # We'll parse the TSV in two ways:
+            #  - If it's row-based with "GENE_SYMBOL\tGENE_ID" as the first line
+            #  - Or if it's key-value lines (like "GENE_SYMBOLS\tTSPAN1,MPZL2,...")
+            # The body is streamed line by line, so parsing overlaps with the
+            # (gzip-decompressed) download instead of buffering the whole file.
+            # Lines stay as bytes; only the final joined values are decoded.
+            async with sem:
+                async with get(tsv_url) as tsv_resp:
+                    # Peek the first line to see which format we have. Leading
+                    # whitespace (e.g. blank lines) is dropped first, as a strip()
+                    # of the whole body would, so the header is the first real line.
+                    chunks = tsv_resp.aiter_bytes()
+                    head = b""
+                    async for chunk in chunks:
+                        head = (head + chunk).lstrip()
+                        if b"\n" in head:
+                            break
+                    first_line = head.split(b"\n", 1)[0]
+                    header_line = first_line.lower()
+
+                    if not first_line.strip():
+                        print("  WARNING: TSV is empty.")
+
+                    # Case A: row-based format
+                    # e.g. first line might be "GENE_SYMBOL   GENE_ID   ..."
+                    elif b"gene_symbol" in header_line and b"gene_id" in header_line:
+                        # We can parse each subsequent line as one gene per row
+                        gene_symbols = []
+                        gene_ids = []
+                        lines = _byte_lines(chunks, head)
+                        await anext(lines)  # skip the header
+                        async for raw_line in lines:
+                            parts = raw_line.strip().split(b"\t", 2)
+                            if len(parts) >= 2:
+                                symbol = parts[0].strip()
+                                gid = parts[1].strip()
+                                gene_symbols.append(symbol)
+                                gene_ids.append(gid)
+                        meta.GENE_SYMBOLS = b",".join(gene_symbols).decode("utf-8")
+                        meta.SOURCE_MEMBERS = b",".join(gene_ids).decode("utf-8")
+
                     else:
-                        # fallback if no parentheses
-                        meta["CONTRIBUTOR"] = value
-                elif "founder" in label:
-                    meta["FOUNDER_NAMES"] = value
-                # etc. Additional fields can be mapped as needed.
-        else:
-            print("  WARNING: No table with class='lists4 human' found on detail page. Skipping metadata extraction.")
+                        # Case B: key-value format
+                        # e.g. lines like:
+                        #   GENE_SYMBOLS    TSPAN1,MPZL2,VAV3,...
+                        #   SOURCE_MEMBERS  10103,10205,...
+                        # These files are small, so read the rest and pull out the two
+                        # fields we want ("GENE_SYMBOLS" and "SOURCE_MEMBERS") with
+                        # bytes.find instead of splitting every line.
+                        # If there are other fields in this key-value TSV you want, grab them too.
+                        data = b"\n" + head + b"".join([chunk async for chunk in chunks])
+                        meta.GENE_SYMBOLS = _kv_field(data, b"GENE_SYMBOLS")
+                        meta.SOURCE_MEMBERS = _kv_field(data, b"SOURCE_MEMBERS")
 
         # --------------------------------------------------------
-        # 4. Download the TSV that contains gene info
+        # 4. Write each gene set to the TSV file as soon as it is ready
         # --------------------------------------------------------
-        tsv_link_tag = detail_soup.find("a", href=re.compile("download_geneset.jsp.*fileType=TSV"))
-        if not tsv_link_tag:
-            print("  WARNING: No TSV link found. Cannot collect gene members.")
-            results.append(meta)
-            time.sleep(sleep_seconds)
-            continue
-
-        tsv_url = "https://www.gsea-msigdb.org/gsea/" + tsv_link_tag["href"]
-        print(f"  Downloading TSV: {tsv_url}")
-        tsv_resp = requests.get(tsv_url)
-        tsv_resp.raise_for_status()
-
-        # We'll parse the TSV in two ways:
-        #  - If it's row-based with "GENE_SYMBOL\tGENE_ID" as the first line
-        #  - Or if it's key-value lines (like "GENE_SYMBOLS\tTSPAN1,MPZL2,...")
-
-        lines = tsv_resp.text.strip().split("\n")
-        if not lines:
-            print("  WARNING: TSV is empty.")
-            results.append(meta)
-            time.sleep(sleep_seconds)
-            continue
-
-        # Check the first line to see which format we have
-        header_line = lines[0].lower()
-
-        # Case A: row-based format
-        # e.g. first line might be "GENE_SYMBOL   GENE_ID   ..."
-        if "gene_symbol" in header_line and "gene_id" in header_line:
-            # We can parse each subsequent line as one gene per row
-            gene_symbols = []
-            gene_ids = []
-            for idx, line in enumerate(lines):
-                # skip the header
-                if idx == 0:
-                    continue
-                parts = line.strip().split("\t")
-                if len(parts) >= 2:
-                    symbol = parts[0].strip()
-                    gid = parts[1].strip()
-                    gene_symbols.append(symbol)
-                    gene_ids.append(gid)
-            meta["GENE_SYMBOLS"] = ",".join(gene_symbols)
-            meta["SOURCE_MEMBERS"] = ",".join(gene_ids)
-
-        else:
-            # Case B: key-value format
-            # e.g. lines like:
-            #   GENE_SYMBOLS    TSPAN1,MPZL2,VAV3,...
-            #   SOURCE_MEMBERS  10103,10205,...
-            for line in lines:
-                if not line.strip():
-                    continue
-                kv_parts = line.split("\t", 1)
-                if len(kv_parts) != 2:
-                    continue
-                key = kv_parts[0].strip()
-                val = kv_parts[1].strip()
-
-                # We specifically want the lines "GENE_SYMBOLS" and "SOURCE_MEMBERS"
-                if key == "GENE_SYMBOLS":
-                    meta["GENE_SYMBOLS"] = val
-                elif key == "SOURCE_MEMBERS":
-                    meta["SOURCE_MEMBERS"] = val
-                # If there are other fields in this key-value TSV you want, parse them too.
-
-        # Save the meta for this gene set
-        results.append(meta)
-        time.sleep(sleep_seconds)
-
-    # --------------------------------------------------------
-    # 5. Write everything to a TSV file
-    # --------------------------------------------------------
-    with open(output_tsv, mode="w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter="\t")
-        writer.writeheader()
-        for entry in results:
-            writer.writerow(entry)
-
-    print(f"\nDone! Collected {len(results)} gene sets. Results in: {output_tsv}")
+        loop = asyncio.get_running_loop()
+        count = 0
+        with open(output_tsv, mode="w", newline="", encoding="utf-8") as f, \
+                ThreadPoolExecutor(max_workers=parse_workers) as executor, \
+                contextlib.closing(sqlite3.connect(etag_path)) as etag_db:
+            # One row per detail page: url -> ETag and the metadata scraped for it.
+            # Only the ETags are held in memory; stored metadata is read back on a 304.
+            etag_db.execute("CREATE TABLE IF NOT EXISTS etags (url TEXT PRIMARY KEY, etag TEXT NOT NULL, meta TEXT NOT NULL)")
+            etags = dict(etag_db.execute("SELECT url, etag FROM etags"))
+
+            writer = csv.writer(f, delimiter="\t")
+            writer.writerow(FIELDNAMES)
+
+            # Pages are processed concurrently in a bounded window: awaiting the
+            # oldest task keeps rows in detail_links order, and each task is
+            # dropped once written, so only the window's rows are ever in memory
+            links = enumerate(detail_links, start=1)
+            window = collections.deque(
+                asyncio.create_task(process(i, u))
+                for i, u in itertools.islice(links, max_concurrency * WRITE_AHEAD)
+            )
+            try:
+                while window:
+                    task = window.popleft()
+                    writer.writerow((await task).as_tuple())
+                    f.flush()  # a crashed run keeps every row written so far
+                    count += 1
+                    for i, u in itertools.islice(links, 1):
+                        window.append(asyncio.create_task(process(i, u)))
+            finally:
+                for task in window:
+                    task.cancel()
 
+    print(f"\nDone! Collected {count} gene sets. Results in: {output_tsv}")
 
 if __name__ == "__main__":
     """
@@ -236,12 +554,12 @@ if __name__ == "__main__":
        python gsea.py
 
     2) Or pass a different URL, e.g. to search for 'TGF':
-       scrape_gsea(
+       asyncio.run(scrape_gsea(
          browse_url="https://www.gsea-msigdb.org/gsea/msigdb/human/genesets.jsp?geneSetName=TGF&Search=Search",
          output_tsv="gsea_tgf_results.tsv"
-       )
+       ))
 
-    Adjust 'sleep_seconds' to be polite. 
+    Adjust 'requests_per_second' and 'max_concurrency' to be polite.
     """
     # Default: scrape sets starting with letter A
-    scrape_gsea()
\ No newline at end of file
+    asyncio.run(scrape_gsea())